@@ -53,6 +53,7 @@ parser.add_argument('--wqtype', type=str, default="adaround", help='Weight quant
 parser.add_argument('--xqtype', type=str, default="lsq", help='Input quantizer')
 parser.add_argument('--num_samples', type=int, default=1024, help="Number of samples for calibration")
 parser.add_argument("--layer_trainer", type=str2bool, nargs='?', const=True, default=False, help="enable layer-wise training / calibration")
+parser.add_argument("--fuse_qkv", type=str2bool, nargs='?', const=True, default=False, help="fuse query, key, and value into a single projection")
 
 args = parser.parse_args()
 
@@ -89,7 +90,7 @@ def main():
     model = AutoModelForSequenceClassification.from_pretrained('Intel/bert-base-uncased-mrpc')
     tokenizer = AutoTokenizer.from_pretrained('Intel/bert-base-uncased-mrpc')
 
-    wrapper = BERT4Compress(model=model)
+    wrapper = BERT4Compress(model=model, fuse_qkv=args.fuse_qkv)
     model = wrapper.convert()
 
     # load and encode the data
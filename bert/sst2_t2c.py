@@ -55,6 +55,7 @@ parser.add_argument('--wqtype', type=str, default="adaround", help='Weight quant
 parser.add_argument('--xqtype', type=str, default="lsq", help='Input quantizer')
 parser.add_argument('--num_samples', type=int, default=1024, help="Number of samples for calibration")
 parser.add_argument("--layer_trainer", type=str2bool, nargs='?', const=True, default=False, help="enable layer-wise training / calibration")
+parser.add_argument("--fuse_qkv", type=str2bool, nargs='?', const=True, default=False, help="fuse query, key, and value into a single projection")
 
 args = parser.parse_args()
 
@@ -119,8 +120,12 @@ def main():
     # tokenizer = AutoTokenizer.from_pretrained('gokuls/bert-base-sst2')
 
     state_tmp = load_checkpoint(ckpt=args.resume, state=model.state_dict())
-    wrapper = BERT4Compress(model=model, state_dict=state_tmp)
-    model = wrapper.reload(wqtype=args.wqtype, xqtype=args.xqtype)
+    wrapper = BERT4Compress(model=model, state_dict=state_tmp, fuse_qkv=args.fuse_qkv)
+    # the pre-trained model is discarded after the conversion, so its weights can be shared
+    model = wrapper.reload(wqtype=args.wqtype, xqtype=args.xqtype, share_weights=True)
+
+    # the fused model has no separate query / key / value projections
+    state_tmp = wrapper.drop_unfused_keys(state_tmp)
 
     # resume from the checkpoint
     model.load_state_dict(state_tmp)
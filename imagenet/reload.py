@@ -163,7 +163,8 @@ def main():
     ckpt = torch.load(args.resume)
     
     converter = wrapper(model, wbit=args.wbit, abit=args.abit, state_dict=ckpt)
-    model = converter.convert()
+    # the pre-trained model is discarded after the conversion, so its weights can be shared
+    model = converter.convert(share_weights=True)
 
     # t2c and model fuse
     t2c = T2C(model=model, swl=args.swl, sfl=args.sfl, args=args)
@@ -324,18 +324,30 @@ class QBertSelfAttention(nn.Module):
         self.attn_scale = MulShift()
         self.attn_scale.scale.data.copy_(1 / math.sqrt(self.attention_head_size))
 
+        # fused qkv projection (replaces query, key, and value if assigned)
+        self.qkv = None
+
         # train flag
         self.train_flag = True
 
+    def qkv_proj(self, hidden_states:torch.Tensor):
+        """
+        Fused Q, K, V projection with a single GEMM, split back to query, key, and value
+        """
+        return self.qkv(hidden_states).split(self.all_head_size, dim=-1)
+
     def inference(self):
         self.xq.inference()
         self.qquery.inference()
         self.qkey.inference()
         self.qvalue.inference()
 
-        self.query.inference()
-        self.key.inference()
-        self.value.inference()
+        if self.qkv is not None:
+            self.qkv.inference()
+        else:
+            self.query.inference()
+            self.key.inference()
+            self.value.inference()
 
         self.train_flag = False
 
@@ -355,7 +367,11 @@ class QBertSelfAttention(nn.Module):
     ) -> Tuple[torch.Tensor]:
             
         hidden_states = self.xq(hidden_states)
-        mixed_query_layer = self.query(hidden_states)
+
+        if self.qkv is not None:
+            mixed_query_layer, key, value = self.qkv_proj(hidden_states)
+        else:
+            mixed_query_layer = self.query(hidden_states)
         # print(mixed_query_layer.mean().item())
 
         # low precision Q
@@ -381,22 +397,26 @@ class QBertSelfAttention(nn.Module):
             value_layer = self.transpose_for_scores(value)
             attention_mask = encoder_attention_mask
         elif past_key_value is not None:
-            key = self.key(hidden_states)
+            if self.qkv is None:
+                key = self.key(hidden_states)
+                value = self.value(hidden_states)
+
             key_layer = self.qkey(key)
             key_layer = self.transpose_for_scores(key_layer)
 
-            value = self.value(hidden_states)
             value_layer = self.qvalue(value)
             value_layer = self.transpose_for_scores(value_layer)
             
             key_layer = torch.cat([past_key_value[0], key_layer], dim=2)
             value_layer = torch.cat([past_key_value[1], value_layer], dim=2)
         else:
-            key = self.key(hidden_states)
+            if self.qkv is None:
+                key = self.key(hidden_states)
+                value = self.value(hidden_states)
+
             key_layer = self.qkey(key)
             key_layer = self.transpose_for_scores(key_layer)
 
-            value = self.value(hidden_states)
             value_layer = self.qvalue(value)
             value_layer = self.transpose_for_scores(value_layer)
 
@@ -483,18 +503,22 @@ class QBertSelfAttention(nn.Module):
         
         hidden_states = self.xq(hidden_states)
 
+        if self.qkv is not None:
+            mixed_query_layer, key, value = self.qkv_proj(hidden_states)
+        else:
+            mixed_query_layer = self.query(hidden_states)
+            key = self.key(hidden_states)
+            value = self.value(hidden_states)
+
         # Q
-        mixed_query_layer = self.query(hidden_states)
         mixed_query_layer = self.qquery(mixed_query_layer)
         query_layer = self.transpose_for_scores(mixed_query_layer)
         
         # K
-        key = self.key(hidden_states)
         key_layer = self.qkey(key)
         key_layer = self.transpose_for_scores(key_layer)
 
         # V
-        value = self.value(hidden_states)
         value_layer = self.qvalue(value)
         value_layer = self.transpose_for_scores(value_layer)
         
@@ -2,9 +2,11 @@
 Basic Modules for Low precision and Sparsity
 """
 
+import math
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from typing import Tuple
 from src.quantization.observer import BaseObserver
 from src.module.ops import IntActWeight
 
@@ -32,6 +34,7 @@ class _QBase(nn.Module):
     evalFunc (input:Tensor): Forward pass function of inference. 
     inference(): Switch to inference mode. 
     register_qparm(): Register the quantization parameters (scale and zero point) as buffer parameters
+    register_qparams_shaped(shape): Register the quantization parameters with a given shape (e.g., channel-wise)
     """
     def __init__(self, nbit:int, train_flag:bool=True, unsigned:bool=True):
         super(_QBase, self).__init__()
@@ -59,12 +62,26 @@ class _QBase(nn.Module):
         self.register_buffer("scale", torch.tensor(1.0))
         self.register_buffer("zero_point", torch.tensor(0.0))
 
+    def register_qparams_shaped(self, shape:Tuple[int, ...]):
+        # the subclass registers all of its q params (including the extra buffers) first
+        self.register_qparams()
+
+        # then the scaler and zero point are laid out in the target shape (views, no extra allocation)
+        numel = math.prod(shape)
+        for name, fill in (("scale", torch.ones), ("zero_point", torch.zeros)):
+            qparam = getattr(self, name)
+
+            if qparam.numel() == numel:
+                self.register_buffer(name, qparam.view(shape))
+            else:
+                self.register_buffer(name, fill(shape, device=qparam.device, dtype=qparam.dtype))
+
     def q(self, x:torch.Tensor):
         """
         Quantization operation
         """
         return x
-    
+
     def trainFunc(self, x:torch.Tensor):
         """
         Training path (QAT and PTQ) with quantize + dequantize
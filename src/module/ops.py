@@ -38,10 +38,30 @@ class IntActWeight(nn.Module):
         self.register_buffer("scale", torch.ones(1, 1, 1, dtype=torch.float32))
         self.nbit = nbit
 
+    def int_mm(self, x:torch.Tensor, y:torch.Tensor) -> torch.Tensor:
+        """
+        Fallback without t2c_gemm: int8 x int8 -> int32 GEMM of PyTorch with the scale applied as the epilogue
+        """
+        xr = x.reshape(-1, x.shape[-1])
+
+        # torch._int_mm requires CUDA, more than 16 rows, and both K and N to be multiples of 8
+        if xr.is_cuda and xr.shape[0] > 16 and xr.shape[1] % 8 == 0 and y.shape[0] % 8 == 0:
+            z = torch._int_mm(xr, y.to(torch.int8).t())
+        else:
+            # float64 keeps the int8 x int8 accumulation exact (float32 is not beyond 2^24)
+            z = xr.double() @ y.double().t()
+
+        # scale before restoring the leading dims, otherwise the (1, 1, 1) scale broadcasts 2D outputs to 3D
+        z = z.float().mul(self.scale)
+        return z.reshape(*x.shape[:-1], y.shape[0])
+
     def forward(self, x:torch.Tensor, y:torch.Tensor) -> torch.Tensor:
         x = x.to(torch.int8)
 
-        z = t2c_gemm.bmw_int8(x, y, self.scale)
+        if INTMM:
+            z = t2c_gemm.bmw_int8(x, y, self.scale)
+        else:
+            z = self.int_mm(x, y)
         return z.to(torch.float16)
 
 class FloatMatMul(nn.Module):
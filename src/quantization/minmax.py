@@ -68,13 +68,50 @@ class MinMaxChannelWiseActObserver(BaseChannelWiseObserver):
         
         return scale, zero_point
 
+def _fake_quant(x:torch.Tensor, scale:torch.Tensor, zero_point:torch.Tensor, qlb:int, qub:int, dequantize:bool):
+    xr = round_ste(x * scale) + zero_point
+    xq = torch.clamp(xr, min=qlb, max=qub)
+    xdq = xq.sub(zero_point)
+
+    if dequantize:
+        xdq = xdq.div(scale)
+    return xdq
+
+_compiled_fake_quant = None
+
+def compiled_fake_quant():
+    """
+    Compile the fake quantization lazily (module level, so the quantizers stay deepcopy-able)
+    """
+    global _compiled_fake_quant
+    if _compiled_fake_quant is None:
+        _compiled_fake_quant = torch.compile(_fake_quant, dynamic=True)
+    return _compiled_fake_quant
+
 class MinMaxQuantizer(_QBase):
+    # run the fake quantization with the compiled kernel (switched per instance by enable_compile)
+    compiled:bool = False
+
     def __init__(self, nbit: int, train_flag: bool = True, unsigned: bool = True):
         super().__init__(nbit, train_flag, unsigned)
         
         # observer
         self.observer = MinMaxObserver(nbit=self.nbit, unsigned=self.unsigned)
 
+    def enable_compile(self, enable:bool=True):
+        """
+        Opt-in: the stateless fake quantization is compiled once and shared by all the quantizers, 
+        the observer update stays in eager mode.
+        """
+        self.compiled = enable
+
+    def fake_quant(self, x:torch.Tensor):
+        """
+        Quantize (and dequantize) with the current scale and zero point
+        """
+        fn = compiled_fake_quant() if self.compiled else _fake_quant
+        return fn(x, self.scale, self.zero_point, self.qlb, self.qub, self.dequantize)
+
     def q(self, x:torch.Tensor):
         if self.train_flag:
             delta, zero_point = self.observer(x)
@@ -82,14 +119,8 @@ class MinMaxQuantizer(_QBase):
             self.scale.data = 1 / delta
             self.zero_point.data = zero_point
         
-        xr = round_ste(x * self.scale) + self.zero_point
-        xq = torch.clamp(xr, min=self.qlb, max=self.qub)
-        xdq = xq.sub(self.zero_point)
-
-        # dequantize
-        if self.dequantize:
-            xdq = xdq.div(self.scale)
-        
+        # quantize + dequantize
+        xdq = self.fake_quant(x)
         return xdq
     
     def trainFunc(self, input: torch.Tensor):
@@ -6,6 +6,9 @@ import torch
 import torch.nn as nn
 
 class BaseObserver(nn.Module):
+    # granularity flag, checked instead of isinstance when shaping the q params
+    is_channelwise:bool = False
+
     def __init__(self, nbit:int, unsigned:bool=True):
         super().__init__()
 
@@ -66,6 +69,8 @@ class BaseObserver(nn.Module):
 
 
 class BaseChannelWiseObserver(BaseObserver):
+    is_channelwise:bool = True
+
     def __init__(self, nbit: int, unsigned: bool = True, num_channels:int=1):
         self.num_channels = num_channels
         super().__init__(nbit, unsigned)
@@ -75,8 +80,8 @@ class BaseChannelWiseObserver(BaseObserver):
         
     def register_range(self):
         # register buffer for the floating point range
-        self.register_buffer("lb", torch.ones(self.num_channels, 1).mul(float("-inf")))
-        self.register_buffer("ub", torch.ones(self.num_channels, 1).mul(float("inf")))
+        self.register_buffer("lb", torch.full((self.num_channels, 1), float("-inf")))
+        self.register_buffer("ub", torch.full((self.num_channels, 1), float("inf")))
 
     def reshape(self, x):
         xr = x.reshape(-1, x.shape[-1])
@@ -112,8 +117,8 @@ class BaseTokenWiseObserver(BaseObserver):
 
     def register_range(self):
         # register buffer for the floating point range
-        self.register_buffer("lb", torch.ones(1, self.num_tokens, 1).mul(float("-inf")))
-        self.register_buffer("ub", torch.ones(1, self.num_tokens, 1).mul(float("inf")))
+        self.register_buffer("lb", torch.full((1, self.num_tokens, 1), float("-inf")))
+        self.register_buffer("ub", torch.full((1, self.num_tokens, 1), float("inf")))
 
     def get_bound(self, x:torch.Tensor):
         # x = x.view(self.num_tokens, -1)
@@ -5,7 +5,9 @@ import torch
 import copy
 import torch.nn as nn
 
-from typing import Tuple
+from enum import IntEnum
+from functools import partial
+from typing import Tuple, Iterator
 from src.module.base import _QBaseLinear, _QBaseConv2d, _QBase
 from src.module.fuse import MulQuant, MulShift
 from src.module.attention import QAttention, QWindowAttention, QBertSelfAttention, QLlamaAttention, QMultiScaleRetention
@@ -14,7 +16,7 @@ from src.quantization.adaround import AdaRound
 from src.quantization.lsq import LSQ, LSQTokenWise
 from src.quantization.qdrop import QDrop, QDropTokenWise
 from src.quantization.minmax import MinMaxQuantizer, MinMaxTokenWiseQuantizer, MinMaxChannelWiseWeightQuantizer, MinMaxChannelWiseActQuantizer
-from src.quantization.observer import BaseObserver, BaseChannelWiseObserver, BaseTokenWiseObserver
+from src.quantization.observer import BaseObserver, BaseTokenWiseObserver
 from src.quantization.smoothquant import SmoothQuantizer, SmoothQuantChannelWiseWeightQuantizer, SmoothQuantTokenWiseQuantizer
 from src.models.lm.retnet import MultiScaleRetention, GLU
 
@@ -28,27 +30,46 @@ from transformers.models.llama.modeling_llama import LlamaSdpaAttention, LlamaML
 
 from typing import Union, Dict
 
-weight_quantizer = {
-    "adaround": AdaRound,
-    "minmax": MinMaxQuantizer,
-    "minmax_channel": MinMaxChannelWiseWeightQuantizer,
-    "smooth": SmoothQuantizer,
-    "smooth_channel": SmoothQuantChannelWiseWeightQuantizer,
-    "identity": _QBase
-}
-
-input_quantizer = {
-    "minmax": MinMaxQuantizer,
-    "minmax_token": MinMaxTokenWiseQuantizer,
-    "minmax_channel": MinMaxChannelWiseActQuantizer,
-    "smooth": SmoothQuantizer,
-    "smooth_token": SmoothQuantTokenWiseQuantizer,
-    "lsq": LSQ,
-    "lsq_token": LSQTokenWise,
-    "qdrop": QDrop,
-    "qdrop_token": QDropTokenWise,
-    "identity": _QBase
-}
+class WQ(IntEnum):
+    ADAROUND = 0
+    MINMAX = 1
+    MINMAX_CHANNEL = 2
+    SMOOTH = 3
+    SMOOTH_CHANNEL = 4
+    IDENTITY = 5
+
+class XQ(IntEnum):
+    MINMAX = 0
+    MINMAX_TOKEN = 1
+    MINMAX_CHANNEL = 2
+    SMOOTH = 3
+    SMOOTH_TOKEN = 4
+    LSQ = 5
+    LSQ_TOKEN = 6
+    QDROP = 7
+    QDROP_TOKEN = 8
+    IDENTITY = 9
+
+# constructors indexed by the enums above
+WQ_CTOR = (AdaRound, MinMaxQuantizer, MinMaxChannelWiseWeightQuantizer, SmoothQuantizer, SmoothQuantChannelWiseWeightQuantizer, _QBase)
+XQ_CTOR = (MinMaxQuantizer, MinMaxTokenWiseQuantizer, MinMaxChannelWiseActQuantizer, SmoothQuantizer, SmoothQuantTokenWiseQuantizer, 
+           LSQ, LSQTokenWise, QDrop, QDropTokenWise, _QBase)
+
+# string-keyed registries (e.g., "minmax_channel")
+weight_quantizer = {q.name.lower(): WQ_CTOR[q] for q in WQ}
+input_quantizer = {q.name.lower(): XQ_CTOR[q] for q in XQ}
+
+def qtype_enum(enum:type, qtype:Union[str, IntEnum]) -> IntEnum:
+    # resolve the quantizer type string once, e.g., "minmax_channel" -> WQ.MINMAX_CHANNEL
+    return qtype if isinstance(qtype, enum) else enum[qtype.upper()]
+
+# checkpoint entries that are loaded into the quantizers
+qparam_suffixes = (".scale", ".zero_point", ".observer.lb", ".observer.ub", ".delta")
+
+def is_identity(quantizer:nn.Module) -> bool:
+    # exact type check, every quantizer inherits from _QBase
+    return type(quantizer) is _QBase
+
 def get_parent_name(target:str) -> Tuple[str, str]:
     r = target.rsplit(".", 1)
     if len(r) == 1:
@@ -56,15 +77,75 @@ def get_parent_name(target:str) -> Tuple[str, str]:
     else:
         return r[0], r[1]
 
+def _iter_with_parents(model:nn.Module) -> Iterator[Tuple[str, nn.Module, str, nn.Module]]:
+    """
+    Walk the sub-modules recursively and yield (name, parent, attribute, module), 
+    so the module can be swapped by setattr(parent, attribute, new_module) directly.
+    """
+    memo = set()
+
+    def walk(parent:nn.Module, prefix:str):
+        for attr, child in list(parent._modules.items()):
+            if child is None or child in memo:
+                continue
+            memo.add(child)
+
+            yield prefix + attr, parent, attr, child
+            yield from walk(child, prefix + attr + ".")
+
+    yield from walk(model, "")
+
+def _shallow_clone(model:nn.Module, memo:Dict=None) -> nn.Module:
+    """
+    Structural copy of the module tree. Every module object and its containers (parameters, buffers, hooks) are new,
+    but the parameter and buffer tensors are shared with the source until the module is swapped. 
+    Note: in-place updates of the modules that are kept (e.g., load_state_dict, .to()) are visible in the source model. 
+    """
+    if memo is None:
+        memo = {}
+
+    if id(model) in memo:
+        return memo[id(model)]
+
+    new = model.__class__.__new__(model.__class__)
+    new.__dict__ = model.__dict__.copy()
+    memo[id(model)] = new
+
+    # private containers (parameters, buffers, and every hook dict) are copied per module
+    for k, v in model.__dict__.items():
+        if k.startswith("_") and isinstance(v, (dict, set)) and k != "_modules":
+            new.__dict__[k] = v.copy()
+
+    new._modules = model._modules.__class__(
+        (name, None if child is None else _shallow_clone(child, memo)) for name, child in model._modules.items()
+    )
+    return new
+
 class Vanilla4Compress(object):
+    # module types replaced by convert_layer
+    convert_types = (nn.Conv2d, nn.Linear)
+
+    # module type -> name of the quantization handler
+    quantize_handlers = {
+        _QBaseConv2d: "quantize_linear",
+        _QBaseLinear: "quantize_linear",
+        MulQuant: "quantize_mul",
+        MulShift: "quantize_mul",
+    }
+
     def __init__(self, model:nn.Module, wbit:int=8, abit:int=8, state_dict:Dict=None) -> None:
         self.model = model
         self.wbit = wbit
         self.abit = abit
         self.state_dict = state_dict
+        self.handler_cache = {}
+        self.staged_qparams = {}
+        self.staged_device = None
 
     def conv(self, layer:nn.Conv2d):
-        has_bias = layer.bias is not None
+        # snapshot the attributes once
+        weight, bias = layer.weight, layer.bias
+        has_bias = bias is not None
 
         new_layer = _QBaseConv2d(
             layer.in_channels,
@@ -80,15 +161,17 @@ class Vanilla4Compress(object):
         )
         
         # copy the weights and bias to the new layer
-        new_layer.weight.data[:] = layer.weight
+        with torch.no_grad():
+            new_layer.weight.copy_(weight, non_blocking=True)
         
-        if has_bias:
-            new_layer.bias.data[:] = layer.bias
+            if has_bias:
+                new_layer.bias.copy_(bias, non_blocking=True)
 
         return new_layer
 
     def linear(self, layer:nn.Linear):
-        has_bias = layer.bias is not None
+        weight, bias = layer.weight, layer.bias
+        has_bias = bias is not None
 
         new_layer = _QBaseLinear(
             in_features=layer.in_features,
@@ -98,10 +181,11 @@ class Vanilla4Compress(object):
             abit=self.abit
         )
 
-        new_layer.weight.data[:] = layer.weight
+        with torch.no_grad():
+            new_layer.weight.copy_(weight, non_blocking=True)
 
-        if has_bias:
-            new_layer.bias.data[:] = layer.bias
+            if has_bias:
+                new_layer.bias.copy_(bias, non_blocking=True)
         return new_layer
 
     def mlp(self, layer:Mlp):
@@ -126,7 +210,7 @@ class Vanilla4Compress(object):
             proj_drop=layer.proj_drop.p
         )
 
-        # conver the linear layer
+        # conver the linear layer (qkv of timm is already a single fused projection)
         qqkv = self.linear(layer.qkv)
         qproj = self.linear(layer.proj)
 
@@ -159,54 +243,131 @@ class Vanilla4Compress(object):
         return qattn
 
 
-    def assign_quantizer(self, model, wqtype, xqtype):
-        model = copy.deepcopy(model)
-        modules = dict(model.named_modules(remove_duplicate=True))
+    def convert_layer(self, layer:nn.Module):
+        if isinstance(layer, nn.Conv2d):
+            layer = self.conv(layer)
+        
+        elif isinstance(layer, nn.Linear):
+            layer = self.linear(layer)
 
-        for n, m in modules.items():
-            if isinstance(m, (_QBaseConv2d, _QBaseLinear)):
-                if wqtype == "adaround":
-                    m.wq = weight_quantizer[wqtype](nbit=self.wbit, train_flag=False, weights=m.weight)
-                else:
-                    m.wq = weight_quantizer[wqtype](nbit=self.wbit, train_flag=False)
-                
-                if isinstance(m, _QBaseConv2d):
-                    if m.in_channels != 3:
-                        m.aq = input_quantizer[xqtype](nbit=self.abit, train_flag=False, unsigned=True)
-                else:
-                    m.aq = input_quantizer[xqtype](nbit=self.abit, train_flag=False, unsigned=True)
+        return layer
 
-                m = self.reshape_quantizer(m, n)
+    def bind_quantizers(self, wqtype:Union[str, WQ], xqtype:Union[str, XQ]):
+        """
+        Resolve the quantizer constructors once per traversal with the precision pre-applied.
+        """
+        wq = qtype_enum(WQ, wqtype)
+        xq = qtype_enum(XQ, xqtype)
+
+        self.wq_with_weights = wq is WQ.ADAROUND
+        self.make_wq = partial(WQ_CTOR[wq], nbit=self.wbit)
+        self.make_xq = partial(XQ_CTOR[xq], nbit=self.abit)
+
+    def new_wq(self, weights:torch.Tensor, **kwargs):
+        if self.wq_with_weights:
+            return self.make_wq(weights=weights, **kwargs)
+        return self.make_wq(**kwargs)
+
+    def quantize_linear(self, layer:Union[_QBaseConv2d, _QBaseLinear], layer_name:str, **kwargs):
+        with torch.device(layer.weight.device):
+            layer.wq = self.new_wq(layer.weight, train_flag=False)
+        
+            if isinstance(layer, _QBaseConv2d):
+                if layer.in_channels != 3:
+                    layer.aq = self.make_xq(train_flag=False, unsigned=True)
+            else:
+                layer.aq = self.make_xq(train_flag=False, unsigned=True)
 
-                parent_name, name = get_parent_name(n)
-                setattr(modules[parent_name], name, m)
+            layer = self.reshape_quantizer(layer, layer_name)
+        return layer
 
-            elif isinstance(m, (MulQuant, MulShift)):
-                parent_name, name = get_parent_name(n)
-                m = self.reshape_quantizer(m, n)
-                setattr(modules[parent_name], name, m)
+    def quantize_mul(self, layer:Union[MulQuant, MulShift], layer_name:str, **kwargs):
+        return self.reshape_quantizer(layer, layer_name)
 
-        return model
-    
-    def convert(self):
-        model = copy.deepcopy(self.model)
-        modules = dict(model.named_modules(remove_duplicate=True))
+    def quantize_handler(self, layer_type:type):
+        """
+        Resolve the handler of a module type along its MRO (same semantics as isinstance), cached per type.
+        """
+        if layer_type not in self.handler_cache:
+            name = next((self.quantize_handlers[t] for t in layer_type.__mro__ if t in self.quantize_handlers), None)
+            self.handler_cache[layer_type] = getattr(self, name) if name is not None else None
 
-        for n, m in modules.items():
-            parent_name, name = get_parent_name(n)
+        return self.handler_cache[layer_type]
 
-            if isinstance(m, nn.Conv2d):
-                new_layer = self.conv(m)
-                setattr(modules[parent_name], name, new_layer)
-            
-            elif isinstance(m, nn.Linear):
-                new_layer = self.linear(m)
-                setattr(modules[parent_name], name, new_layer)
+    def quantize_layer(self, layer:nn.Module, layer_name:str, **kwargs):
+        handler = self.quantize_handler(type(layer))
+
+        if handler is not None:
+            layer = handler(layer, layer_name, **kwargs)
+        return layer
+
+    @torch.no_grad()
+    def swap_modules(self, model:nn.Module, convert:bool=True, quantize:bool=False, **kwargs):
+        """
+        Single traversal of the model. Each child is converted on the way down and 
+        receives its quantizers on the way up, then written back to its parent directly.
+        The conversion never needs autograd, so the whole traversal runs under no_grad.
+        """
+        memo = set()
+
+        if quantize:
+            self.bind_quantizers(kwargs.pop("wqtype"), kwargs.pop("xqtype"))
+            self.release_qparams()
+
+        def visit(parent:nn.Module, prefix:str):
+            # snapshot the children before the parent gets modified
+            for name, child in list(parent._modules.items()):
+                if child is None or child in memo:
+                    continue
+                memo.add(child)
+
+                # leaves without any conversion or quantization (dropout, norm, activation...) are skipped up front
+                if not child._modules and not (convert and isinstance(child, self.convert_types)) \
+                    and not (quantize and self.quantize_handler(type(child)) is not None):
+                    continue
+
+                layer_name = prefix + name
+                layer = self.convert_layer(child) if convert else child
+                
+                visit(layer, layer_name + ".")
 
+                if quantize:
+                    layer = self.quantize_layer(layer, layer_name, **kwargs)
+
+                if layer is not child:
+                    setattr(parent, name, layer)
+
+        visit(model, "")
+
+        # do not keep the staged pool alive after the conversion
+        self.release_qparams()
         return model
+
+    def assign_quantizer(self, model:nn.Module, wqtype:str, xqtype:str, **kwargs):
+        # quantizers are attached in-place, the model is expected to be the converted copy
+        return self.swap_modules(model, convert=False, quantize=True, wqtype=wqtype, xqtype=xqtype, **kwargs)
+    
+    def clone(self, share_weights:bool=False):
+        """
+        Copy of the source model to be converted. With share_weights=True the kept (unconverted) modules alias 
+        the tensors of the source model instead of copying them.
+        """
+        if share_weights:
+            return _shallow_clone(self.model)
+        return copy.deepcopy(self.model)
+
+    def convert(self, model:nn.Module=None, share_weights:bool=False):
+        if model is None:
+            model = self.clone(share_weights)
+        
+        return self.swap_modules(model, convert=True)
     
     def reshape_quantizer(self, layer:Union[_QBaseLinear, _QBaseConv2d], layer_name:str):
         
+        if isinstance(layer, (_QBaseLinear, _QBaseConv2d)) and is_identity(layer.wq) and is_identity(layer.aq):
+            # identity quantizers keep their default q params
+            return layer
+
         if isinstance(layer, _QBaseLinear):
             layer.wq.num_channels = layer.out_features
             layer.aq.num_channels = layer.in_features
@@ -224,8 +385,16 @@ class Vanilla4Compress(object):
             layer.wq.num_channels = layer.out_channels
             layer.aq.num_channels = layer.in_channels
             
-            layer.wq.register_qparams()
-            layer.aq.register_qparams()
+            # channel-wise q params are allocated in the 4D layout of the conv layer
+            if layer.wq.observer.is_channelwise:
+                layer.wq.register_qparams_shaped((layer.out_channels, 1, 1, 1))
+            else:
+                layer.wq.register_qparams()
+
+            if layer.aq.observer.is_channelwise:
+                layer.aq.register_qparams_shaped((1, layer.in_channels, 1, 1))
+            else:
+                layer.aq.register_qparams()
 
             layer.wq.observer.num_channels = layer.out_channels
             layer.aq.observer.num_channels = layer.in_channels
@@ -233,30 +402,80 @@ class Vanilla4Compress(object):
             layer.wq.observer.register_range()
             layer.aq.observer.register_range()
 
-            if isinstance(layer.wq.observer, BaseChannelWiseObserver):
-                layer.wq.scale.unsqueeze_(2).unsqueeze_(3)
-                layer.wq.zero_point.unsqueeze_(2).unsqueeze_(3)
-
-            if isinstance(layer.aq.observer, BaseChannelWiseObserver):
-                layer.aq.scale.unsqueeze_(2).unsqueeze_(3)
-                layer.aq.zero_point.unsqueeze_(2).unsqueeze_(3)
-
         elif isinstance(layer, (MulQuant, MulShift)):
-            layer.scale.data = torch.ones_like(self.state_dict[layer_name+".scale"])
-            layer.bias.data = torch.ones_like(self.state_dict[layer_name+".bias"])
+            self.load_qparam(layer.scale, layer_name+".scale")
+            self.load_qparam(layer.bias, layer_name+".bias")
 
             if isinstance(layer, MulQuant):
-                layer.zero_point.data = torch.ones_like(self.state_dict[layer_name+".zero_point"])
+                self.load_qparam(layer.zero_point, layer_name+".zero_point")
         
         return layer
 
-    def reload_fake_quant(self, wqtype, xqtype):
-        qmodel = self.convert()
-        qmodel = self.assign_quantizer(qmodel, wqtype=wqtype, xqtype=xqtype)
+    def load_qparam(self, qparam:torch.Tensor, key:str):
+        """
+        Reshape the quantization parameter to match the checkpoint. The storage is reused if the shape matches
+        """
+        # stage the checkpoint on the device of the first quantized layer
+        if self.staged_device is None:
+            self.stage_qparams(qparam.device)
+
+        staged = qparam.device == self.staged_device and key in self.staged_qparams
+        ref = self.staged_qparams[key] if staged else self.state_dict[key]
+
+        if qparam.shape == ref.shape:
+            qparam.data.copy_(ref)
+        else:
+            # staged entries are already private views on the target device
+            qparam.data = ref.to(device=qparam.device, copy=not staged)
+
+    def release_qparams(self):
+        self.staged_qparams = {}
+        self.staged_device = None
+
+    def stage_qparams(self, device:torch.device):
+        """
+        Move the q params of the checkpoint to the target device with a single transfer per dtype. 
+        Each entry becomes a view of the pooled tensor, so the quantizers do not allocate them one by one.
+        """
+        self.staged_qparams = {}
+        self.staged_device = device
+
+        if self.state_dict is None:
+            return
+
+        groups = {}
+        for k, v in self.state_dict.items():
+            if isinstance(v, torch.Tensor) and k.endswith(qparam_suffixes):
+                groups.setdefault((v.dtype, v.device), []).append((k, v))
+
+        for entries in groups.values():
+            pool = torch.cat([v.reshape(-1) for _, v in entries]).to(device)
+
+            offset = 0
+            for k, v in entries:
+                self.staged_qparams[k] = pool.narrow(0, offset, v.numel()).view(v.shape)
+                offset += v.numel()
+
+    def reload_fake_quant(self, wqtype, xqtype, share_weights:bool=False):
+        qmodel = self.clone(share_weights)
+        qmodel = self.swap_modules(qmodel, convert=True, quantize=True, wqtype=wqtype, xqtype=xqtype)
         return qmodel
 
+    def reload(self, wqtype, xqtype, share_weights:bool=False):
+        return self.reload_fake_quant(wqtype=wqtype, xqtype=xqtype, share_weights=share_weights)
+
 
 class ViTV4C(Vanilla4Compress):
+    convert_types = (nn.Conv2d, Attention, WindowAttention, Mlp)
+
+    quantize_handlers = {
+        QAttention: "quantize_attn",
+        QWindowAttention: "quantize_attn",
+        Mlp: "quantize_mlp",
+        MulQuant: "quantize_mul",
+        MulShift: "quantize_mul",
+    }
+
     def __init__(self, model: nn.Module, wbit: int = 8, abit: int = 8, state_dict:Dict = None) -> None:
         super().__init__(model, wbit, abit, state_dict)
 
@@ -264,152 +483,183 @@ class ViTV4C(Vanilla4Compress):
         if isinstance(layer, (_QBaseConv2d, _QBaseLinear)):
             layer = super().reshape_quantizer(layer, layer_name)
         
-        elif isinstance(layer, _QBase):
-            layer.scale.data = torch.ones_like(self.state_dict[layer_name+".scale"])
-            layer.zero_point.data = torch.zeros_like(self.state_dict[layer_name+".zero_point"])
+        elif isinstance(layer, _QBase) and not is_identity(layer):
+            self.load_qparam(layer.scale, layer_name+".scale")
+            self.load_qparam(layer.zero_point, layer_name+".zero_point")
             
             observer_lb_key = layer_name+".observer.lb"
             observer_ub_key = layer_name+".observer.ub"
             additional_learnable_param = layer_name+".delta"
 
             if observer_lb_key in self.state_dict.keys():
-                layer.observer.lb.data = torch.zeros_like(self.state_dict[observer_lb_key])
+                self.load_qparam(layer.observer.lb, observer_lb_key)
             
             if observer_ub_key in self.state_dict.keys():
-                layer.observer.ub.data = torch.zeros_like(self.state_dict[observer_ub_key])
+                self.load_qparam(layer.observer.ub, observer_ub_key)
 
             if hasattr(layer, "delta") and additional_learnable_param in self.state_dict.keys():
-                layer.delta.data = torch.ones_like(self.state_dict[layer_name+".delta"])
+                self.load_qparam(layer.delta, layer_name+".delta")
 
         
         elif isinstance(layer, (MulQuant, MulShift)):
-            layer.scale.data = torch.ones_like(self.state_dict[layer_name+".scale"])
-            layer.bias.data = torch.ones_like(self.state_dict[layer_name+".bias"])
+            self.load_qparam(layer.scale, layer_name+".scale")
+            self.load_qparam(layer.bias, layer_name+".bias")
 
             if isinstance(layer, MulQuant):
-                layer.zero_point.data = torch.ones_like(self.state_dict[layer_name+".zero_point"])
+                self.load_qparam(layer.zero_point, layer_name+".zero_point")
             
 
         return layer
 
-    def assign_quantizer(self, model, wqtype, xqtype, inference=False):
-        model = copy.deepcopy(model)
-        modules = dict(model.named_modules(remove_duplicate=True))
+    def quantize_attn(self, layer:Union[QAttention, QWindowAttention], layer_name:str, inference:bool=False):
+        with torch.device(layer.qkv.weight.device):
+            qkvw = layer.qkv.weight
+            projw = layer.proj.weight
 
-        for n, m in modules.items():
-            if isinstance(m, (QAttention, QWindowAttention)):
-                parent_name, name = get_parent_name(n)
+            # low precision weights
+            layer.qkv.wq = self.new_wq(qkvw, train_flag=False)
+            layer.proj.wq = self.new_wq(projw, train_flag=False)
+
+            # update quantizers
+            xq = self.make_xq(train_flag=False, unsigned=False)
+            qqkv = self.make_xq(train_flag=False, unsigned=False)
+            qproj = self.make_xq(train_flag=False, unsigned=False)
+        
+            layer.xq = self.reshape_quantizer(xq, layer_name+".xq")
+            layer.qqkv = self.reshape_quantizer(qqkv, layer_name+".qqkv")
+            layer.qproj = self.reshape_quantizer(qproj, layer_name+".qproj")
+
+            # reshape the q params
+            qkv = self.reshape_quantizer(layer.qkv, layer_name+".qkv")
+            proj = self.reshape_quantizer(layer.proj, layer_name+".proj")
+
+            setattr(layer, "qkv", qkv)
+            setattr(layer, "proj", proj)
+
+            if inference:
+                layer.inference()
+        return layer
+
+    def quantize_mlp(self, layer:Mlp, layer_name:str, inference:bool=False):
+        for subname, sub_parent, sub_name, sub in _iter_with_parents(layer):
+            if isinstance(sub, _QBaseLinear):
+                with torch.device(sub.weight.device):
+                    # add quantizers
+                    w = sub.weight
+                    sub.wq = self.new_wq(w, train_flag=False)
                 
-                qkvw = m.qkv.weight
-                projw = m.proj.weight
-
-                # low precision weights
-                if wqtype == "adaround":
-                    m.qkv.wq = weight_quantizer[wqtype](nbit=self.wbit, weights=qkvw, train_flag=False).cuda()
-                    m.proj.wq = weight_quantizer[wqtype](nbit=self.wbit, weights=projw, train_flag=False).cuda()
-                else:
-                    m.qkv.wq = weight_quantizer[wqtype](nbit=self.wbit, train_flag=False).cuda()
-                    m.proj.wq = weight_quantizer[wqtype](nbit=self.wbit, train_flag=False).cuda()
-
-                # update quantizers
-                xq = input_quantizer[xqtype](nbit=self.abit, train_flag=False, unsigned=False)
-                qqkv = input_quantizer[xqtype](nbit=self.abit, train_flag=False, unsigned=False)
-                qproj = input_quantizer[xqtype](nbit=self.abit, train_flag=False, unsigned=False)
+                    aq = self.make_xq(train_flag=False, unsigned=False)
+
+                    sub = self.reshape_quantizer(sub, layer_name+"."+subname)
+                    aq = self.reshape_quantizer(aq, layer_name+"."+subname+".aq")
                 
-                m.xq = self.reshape_quantizer(xq, n+".xq")
-                m.qqkv = self.reshape_quantizer(qqkv, n+".qqkv")
-                m.qproj = self.reshape_quantizer(qproj, n+".qproj")
-
-                # reshape the q params
-                qkv = self.reshape_quantizer(m.qkv, n+".qkv")
-                proj = self.reshape_quantizer(m.proj, n+".proj")
-
-                setattr(m, "qkv", qkv)
-                setattr(m, "proj", proj)
-                setattr(modules[parent_name], name, m)
-
-                if inference:
-                    m.inference()
-
-            elif isinstance(m, Mlp):
-                mlp = dict(m.named_modules(remove_duplicate=True))
-                for subname, sub in m.named_modules():
-                    if isinstance(sub, _QBaseLinear):
-                        sub_parent, sub_name = get_parent_name(subname)
-
-                        # add quantizers
-                        w = sub.weight
-                        if wqtype == "adaround":
-                            sub.wq = weight_quantizer[wqtype](nbit=self.wbit, weights=w, train_flag=False).cuda()
-                        else:
-                            sub.wq = weight_quantizer[wqtype](nbit=self.wbit, train_flag=False).cuda()
-                        
-                        aq = input_quantizer[xqtype](nbit=self.abit, train_flag=False, unsigned=False)
-
-                        sub = self.reshape_quantizer(sub, n+"."+subname)
-                        aq = self.reshape_quantizer(aq, n+"."+subname+".aq")
-                        
-                        setattr(sub, "aq", aq)
-                        setattr(mlp[sub_parent], sub_name, sub)
-
-                        if inference:
-                            m.inference()
-
-            elif isinstance(m, (MulQuant, MulShift)):
-                parent_name, name = get_parent_name(n)
-                m = self.reshape_quantizer(m, n)
-                setattr(modules[parent_name], name, m)
+                    setattr(sub, "aq", aq)
+                    setattr(sub_parent, sub_name, sub)
 
-        return model
+                    if inference:
+                        layer.inference()
+        return layer
     
-    def convert(self):
-        model = copy.deepcopy(self.model)
-        modules = dict(model.named_modules(remove_duplicate=True))
-
-        for n, m in modules.items():
-            parent_name, name = get_parent_name(n)
-            if isinstance(m, nn.Conv2d):
-                new_layer = self.conv(m)
-                setattr(modules[parent_name], name, new_layer)
-            elif isinstance(m, Attention):
-                new_layer = self.attn(m)
-                setattr(modules[parent_name], name, new_layer)
-            elif isinstance(m, WindowAttention):
-                new_layer = self.wattn(m)
-                setattr(modules[parent_name], name, new_layer)
-            elif isinstance(m, Mlp):
-                new_layer = self.mlp(m)
-                setattr(modules[parent_name], name, new_layer)
+    def convert_layer(self, layer:nn.Module):
+        if isinstance(layer, nn.Conv2d):
+            layer = self.conv(layer)
+        elif isinstance(layer, Attention):
+            layer = self.attn(layer)
+        elif isinstance(layer, WindowAttention):
+            layer = self.wattn(layer)
+        elif isinstance(layer, Mlp):
+            layer = self.mlp(layer)
 
-        return model
+        return layer
 
 
 class BERT4Compress(Vanilla4Compress):
-    def __init__(self, model: nn.Module, wbit: int = 8, abit: int = 8, state_dict: Dict = None) -> None:
+    convert_types = (BertSelfAttention, BertSelfOutput)
+
+    quantize_handlers = {
+        QBertSelfAttention: "quantize_attn",
+        BertSelfOutput: "quantize_output",
+    }
+
+    def __init__(self, model: nn.Module, wbit: int = 8, abit: int = 8, state_dict: Dict = None, fuse_qkv:bool = False) -> None:
         super().__init__(model, wbit, abit, state_dict)
 
         # config
         assert hasattr(model, "config"), "The configuration of the BERT model is missing, are you using hugging face?"
         self.config = self.model.config
 
+        # fuse query, key, and value into a single projection before quantization
+        self.fuse_qkv = fuse_qkv
+        assert not (self.fuse_qkv and self.config.is_decoder), "Fused QKV projection is only supported by the encoder (self-attention)"
+
     def reshape_quantizer(self, layer:Union[_QBaseLinear, _QBaseConv2d, _QBase], layer_name: str):
         if isinstance(layer, (_QBaseConv2d, _QBaseLinear)):
             layer = super().reshape_quantizer(layer, layer_name)
         
-        elif isinstance(layer, _QBase):
-            layer.scale.data = torch.ones_like(self.state_dict[layer_name+".scale"])
-            layer.zero_point.data = torch.zeros_like(self.state_dict[layer_name+".zero_point"])
+        elif isinstance(layer, _QBase) and not is_identity(layer):
+            self.load_qparam(layer.scale, layer_name+".scale")
+            self.load_qparam(layer.zero_point, layer_name+".zero_point")
 
             if hasattr(layer, "delta"):
-                layer.delta.data = torch.ones_like(self.state_dict[layer_name+".delta"])
+                self.load_qparam(layer.delta, layer_name+".delta")
             
-            layer.observer.lb.data = torch.zeros_like(self.state_dict[layer_name+".observer.lb"])
-            layer.observer.ub.data = torch.zeros_like(self.state_dict[layer_name+".observer.ub"])
+            self.load_qparam(layer.observer.lb, layer_name+".observer.lb")
+            self.load_qparam(layer.observer.ub, layer_name+".observer.ub")
         
         return layer
 
+    def drop_unfused_keys(self, state_dict:Dict):
+        """
+        Remove the query, key, and value entries of the source model from the state_dict (in-place), 
+        they are replaced by the single qkv projection when fuse_qkv is enabled.
+        """
+        if not self.fuse_qkv:
+            return state_dict
+
+        prefixes = tuple(
+            f"{n}.{proj}." for n, m in self.model.named_modules() if isinstance(m, BertSelfAttention) 
+            for proj in ("query", "key", "value")
+        )
+
+        for k in [k for k in state_dict.keys() if k.startswith(prefixes)]:
+            del state_dict[k]
+        return state_dict
+
+    def bert_qkv(self, layer:BertSelfAttention):
+        has_bias = layer.query.bias is not None
+
+        new_layer = _QBaseLinear(
+            in_features=layer.query.in_features,
+            out_features=layer.query.out_features + layer.key.out_features + layer.value.out_features,
+            bias=has_bias,
+            wbit=self.wbit,
+            abit=self.abit
+        )
+
+        # copy query, key, and value into their slices of the fused weights (and bias) without a concatenated temporary
+        with torch.no_grad():
+            offset = 0
+            for proj in (layer.query, layer.key, layer.value):
+                nout = proj.out_features
+                new_layer.weight.narrow(0, offset, nout).copy_(proj.weight)
+
+                if has_bias:
+                    new_layer.bias.narrow(0, offset, nout).copy_(proj.bias)
+                offset += nout
+        return new_layer
+
     def bert_attn(self, layer:BertSelfAttention):
         qattn = QBertSelfAttention(config=self.config)
+
+        if self.fuse_qkv:
+            qqkv = self.bert_qkv(layer)
+            setattr(qattn, "qkv", qqkv)
+
+            # the fused projection replaces the individual linear layers
+            del qattn.query
+            del qattn.key
+            del qattn.value
+            return qattn
     
         # convert the linear layer
         qquery = self.linear(layer.query)
@@ -431,97 +681,68 @@ class BERT4Compress(Vanilla4Compress):
         setattr(layer, "dense", qdense)
         return layer
 
-    def convert(self):
-        model = copy.deepcopy(self.model)
-        modules = dict(model.named_modules(remove_duplicate=True))
-
-        for n, m in modules.items():
-            parent_name, name = get_parent_name(n)
-            
-            if isinstance(m, BertSelfAttention):
-                new_layer = self.bert_attn(m)
-                setattr(modules[parent_name], name, new_layer)
-            
-            elif isinstance(m, BertSelfOutput):
-                new_layer = self.bert_output(m)
-                setattr(modules[parent_name], name, new_layer)
+    def convert_layer(self, layer:nn.Module):
+        if isinstance(layer, BertSelfAttention):
+            layer = self.bert_attn(layer)
+        
+        elif isinstance(layer, BertSelfOutput):
+            layer = self.bert_output(layer)
 
-        return model
+        return layer
     
-    def assign_quantizer(self, model, wqtype, xqtype):
-        model = copy.deepcopy(model)
-        modules = dict(model.named_modules(remove_duplicate=True))
-
-        for n, m in modules.items():
-            if isinstance(m, QBertSelfAttention):
-                parent_name, name = get_parent_name(n)
-
-                q = getattr(m, "query")
-                k = getattr(m, "key")
-                v = getattr(m, "value")
-
-                # low precision weights
-                if wqtype == "adaround":
-                    qwq = weight_quantizer[wqtype](nbit=self.wbit, weights=q.weight, train_flag=True).cuda()
-                    kwq = weight_quantizer[wqtype](nbit=self.wbit, weights=k.weight, train_flag=True).cuda()
-                    vwq = weight_quantizer[wqtype](nbit=self.wbit, weights=v.weight, train_flag=True).cuda()
-                else:
-                    qwq = weight_quantizer[wqtype](nbit=self.wbit, train_flag=True).cuda()
-                    kwq = weight_quantizer[wqtype](nbit=self.wbit, train_flag=True).cuda()
-                    vwq = weight_quantizer[wqtype](nbit=self.wbit, train_flag=True).cuda()
-                
-                # tensor quantizer
-                xq = input_quantizer[xqtype](nbit=self.abit, train_flag=True, unsigned=False).cuda()
-                qquery = input_quantizer[xqtype](nbit=self.abit, train_flag=True, unsigned=False).cuda()
-                qkey = input_quantizer[xqtype](nbit=self.abit, train_flag=True, unsigned=False).cuda()
-                qvalue = input_quantizer[xqtype](nbit=self.abit, train_flag=True, unsigned=False).cuda()
-                
-                # reshape the quantizer
-                qwq = self.reshape_quantizer(qwq, n+".query.wq")
-                kwq = self.reshape_quantizer(kwq, n+".key.wq")
-                vwq = self.reshape_quantizer(vwq, n+".value.wq")
-                
-                xq = self.reshape_quantizer(xq, n+".xq")
-                qquery = self.reshape_quantizer(qquery, n+".qquery")
-                qkey = self.reshape_quantizer(qkey, n+".qkey")
-                qvalue = self.reshape_quantizer(qvalue, n+".qvalue")
-                
-                # insert the module
-                setattr(q, "wq", qwq)
-                setattr(k, "wq", kwq)
-                setattr(v, "wq", vwq)
-                
-                setattr(m, "xq", xq)
-                setattr(m, "qquery", qquery)
-                setattr(m, "qkey", qkey)
-                setattr(m, "qvalue", qvalue)
+    def quantize_attn(self, layer:QBertSelfAttention, layer_name:str, **kwargs):
+        with torch.device(next(layer.parameters()).device):
+            if layer.qkv is not None:
+                projs = ["qkv"]
+            else:
+                projs = ["query", "key", "value"]
 
-                setattr(modules[parent_name], name, m)
+            # low precision weights
+            for proj_name in projs:
+                proj = getattr(layer, proj_name)
 
-            elif isinstance(m, BertSelfOutput):
-                parent_name, name = get_parent_name(n)
-                
-                dense = getattr(m, "dense")
-                weight = getattr(dense, "weight")
+                wq = self.new_wq(proj.weight, train_flag=True)
 
-                # add quantizers
-                if wqtype == "adaround":
-                    wq = weight_quantizer[wqtype](nbit=self.wbit, weights=weight, train_flag=False).cuda()
-                else:
-                    wq = weight_quantizer[wqtype](nbit=self.wbit, train_flag=False).cuda()
+                wq = self.reshape_quantizer(wq, layer_name+"."+proj_name+".wq")
+                setattr(proj, "wq", wq)
+        
+            # tensor quantizer
+            xq = self.make_xq(train_flag=True, unsigned=False)
+            qquery = self.make_xq(train_flag=True, unsigned=False)
+            qkey = self.make_xq(train_flag=True, unsigned=False)
+            qvalue = self.make_xq(train_flag=True, unsigned=False)
+        
+            # reshape the quantizer
+            xq = self.reshape_quantizer(xq, layer_name+".xq")
+            qquery = self.reshape_quantizer(qquery, layer_name+".qquery")
+            qkey = self.reshape_quantizer(qkey, layer_name+".qkey")
+            qvalue = self.reshape_quantizer(qvalue, layer_name+".qvalue")
+        
+            # insert the module
+            setattr(layer, "xq", xq)
+            setattr(layer, "qquery", qquery)
+            setattr(layer, "qkey", qkey)
+            setattr(layer, "qvalue", qvalue)
+        return layer
 
-                xq = input_quantizer[xqtype](nbit=self.abit, train_flag=True, unsigned=False).cuda()
+    def quantize_output(self, layer:BertSelfOutput, layer_name:str, **kwargs):
+        with torch.device(layer.dense.weight.device):
+            dense = getattr(layer, "dense")
+            weight = getattr(dense, "weight")
 
-                xq = self.reshape_quantizer(xq, n+".dense.aq")
-                wq = self.reshape_quantizer(wq, n+".dense.wq")
-                
-                setattr(dense, "wq", wq)
-                setattr(dense, "aq", xq)
+            # add quantizers
+            wq = self.new_wq(weight, train_flag=False)
 
-                setattr(m, "dense", dense)
-                setattr(modules[parent_name], name, m)
+            xq = self.make_xq(train_flag=True, unsigned=False)
 
-        return model
+            xq = self.reshape_quantizer(xq, layer_name+".dense.aq")
+            wq = self.reshape_quantizer(wq, layer_name+".dense.wq")
+        
+            setattr(dense, "wq", wq)
+            setattr(dense, "aq", xq)
+
+            setattr(layer, "dense", dense)
+        return layer
 
 
 class Llama4Compress(Vanilla4Compress):
@@ -549,19 +770,16 @@ class Llama4Compress(Vanilla4Compress):
         new_module = self.to_half(new_module)
         return new_module
 
+    @torch.no_grad()
     def convert(self):
-        modules = dict(self.model.named_modules(remove_duplicate=True))
-
-        for n, m in modules.items():
+        for n, parent, name, m in _iter_with_parents(self.model):
             if isinstance(m, LlamaSdpaAttention):
-                parent_name, name = get_parent_name(n)
                 new_module = self.attn(m)
-                setattr(modules[parent_name], name, new_module)
+                setattr(parent, name, new_module)
 
             elif isinstance(m, LlamaMLP):
-                parent_name, name = get_parent_name(n)
                 new_module = self.mlp(m)
-                setattr(modules[parent_name], name, new_module)
+                setattr(parent, name, new_module)
 
         return self.model
 
@@ -597,18 +815,15 @@ class RetNet4Compress(Vanilla4Compress):
         new_mlp.load_state_dict(mlp.state_dict(), strict=False)
         return new_mlp
     
+    @torch.no_grad()
     def convert(self):
-        modules = dict(self.model.named_modules(remove_duplicate=True))
-
-        for n, m in modules.items():
+        for n, parent, name, m in _iter_with_parents(self.model):
             if isinstance(m, MultiScaleRetention):
-                parent_name, name = get_parent_name(n)
                 new_module = self.attn(m)
-                setattr(modules[parent_name], name, new_module)
+                setattr(parent, name, new_module)
 
             elif isinstance(m, GLU):
-                parent_name, name = get_parent_name(n)
                 new_module = self.ffn(m)
-                setattr(modules[parent_name], name, new_module)
+                setattr(parent, name, new_module)
 
         return self.model
\ No newline at end of file
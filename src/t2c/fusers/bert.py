@@ -24,17 +24,33 @@ class BERTFuser(ViTFuser):
         sk = module.qkey.scale
         sv = module.qvalue.scale
 
-        query = getattr(module, "query")
-        key = getattr(module, "key")
-        value = getattr(module, "value")
+        if module.qkv is not None:
+            qkv = getattr(module, "qkv")
 
-        sxq = self.quantizer_fuse(xq, query.wq)
-        sxk = self.quantizer_fuse(xq, key.wq)
-        sxv = self.quantizer_fuse(xq, value.wq)
+            # split the fused scaling factors and bias back to query, key, and value
+            sxqkv = self.quantizer_fuse(xq, qkv.wq)
+
+            # only the output-channel dimension is split (e.g., token-wise xq + per-tensor wq gives [1, T, 1])
+            if sxqkv.dim() > 0 and sxqkv.size(-1) == 3 * module.all_head_size:
+                sxq, sxk, sxv = sxqkv.split(module.all_head_size, dim=-1)
+            else:
+                sxq, sxk, sxv = sxqkv, sxqkv, sxqkv
+            
+            bq, bk, bv = qkv.bias.split(module.all_head_size, dim=0)
+        else:
+            query = getattr(module, "query")
+            key = getattr(module, "key")
+            value = getattr(module, "value")
+
+            sxq = self.quantizer_fuse(xq, query.wq)
+            sxk = self.quantizer_fuse(xq, key.wq)
+            sxv = self.quantizer_fuse(xq, value.wq)
+
+            bq, bk, bv = query.bias, key.bias, value.bias
 
         qquery = MulQuant(nbit=module.qquery.nbit)
         sxq = sq.mul(sxq)
-        qbias = query.bias.mul(sq)
+        qbias = bq.mul(sq)
         
         setattr(qquery, "scale", sxq)
         setattr(qquery, "bias", qbias)
@@ -42,7 +58,7 @@ class BERTFuser(ViTFuser):
 
         qkey = MulQuant(nbit=module.qkey.nbit)        
         sxk = sk.mul(sxk)
-        kbias = key.bias.mul(sk)
+        kbias = bk.mul(sk)
         
         setattr(qkey, "scale", sxk)
         setattr(qkey, "bias", kbias)
@@ -50,7 +66,7 @@ class BERTFuser(ViTFuser):
 
         qvalue = MulQuant(nbit=module.qvalue.nbit)
         sxv = sv.mul(sxv)
-        vbias = value.bias.mul(sv)
+        vbias = bv.mul(sv)
 
         setattr(qvalue, "scale", sxv)
         setattr(qvalue, "bias", vbias)
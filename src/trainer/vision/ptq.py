@@ -105,6 +105,9 @@ class PTQ(object):
 
         # trainer
         self.requires_grad = self.config["quantization"]["requires_grad"]
+
+        # compiled fake quantization of the MinMax quantizers (opt-in)
+        self.compile_fq = self.config["quantization"].get("compile", False)
         self.device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
 
         # loss func
@@ -117,10 +120,19 @@ class PTQ(object):
         
         # cuda
         self.model = self.model.to(self.device)
+        self.compile_quantizers(self.model)
         
         # steps
         self.steps = len(self.trainloader)
 
+    def compile_quantizers(self, module:nn.Module):
+        """
+        Switch the MinMax quantizers of the module to the compiled fake quantization if enabled in the config
+        """
+        for m in module.modules():
+            if isinstance(m, MinMaxQuantizer):
+                m.enable_compile(self.compile_fq)
+
     def freeze(self, layer:Union[nn.Conv2d, nn.Linear]):
         hasbias = layer.bias is not None
 
@@ -182,6 +194,8 @@ class PTQ(object):
             {'params':layer.aq.parameters(), 'lr': self.lr, 'weight_decay': 0.0}, 
         ]
 
+        self.compile_quantizers(layer)
+
         if self.optim_type == "adam":
             optimizer = torch.optim.Adam(qparams, lr=self.lr)
         elif self.optim_type == "sgd":
@@ -229,6 +243,8 @@ class PTQ(object):
         else:
             layer.aq = input_quantizer[self.xqtype](nbit=self.abit, train_flag=True, unsigned=True).to(self.device)
 
+        self.compile_quantizers(layer)
+
         calib_loss = AverageMeter()
         loss_fn = nn.MSELoss()
         for idx, batch in enumerate(tqdm(cached_data)):
@@ -373,6 +389,8 @@ class PTQViT(PTQ):
         elif isinstance(layer, Mlp):
             qlayer = self.update_mlp(layer, name)
         
+        self.compile_quantizers(qlayer)
+
         if self.optim_type == "adam":
             optimizer = torch.optim.Adam(qlayer.parameters(), weight_decay=self.weight_decay)
         elif self.optim_type == "sgd":
@@ -412,6 +430,8 @@ class PTQViT(PTQ):
         elif isinstance(layer, Mlp):
             qlayer = self.update_mlp(layer, name)
         
+        self.compile_quantizers(qlayer)
+
         calib_loss = AverageMeter()
         loss_fn = nn.MSELoss()
         for idx, batch in enumerate(tqdm(cached_data)):
@@ -478,24 +498,20 @@ class PTQBERT(PTQ):
         return cached_data  
 
     def update_attn(self, layer:QBertSelfAttention, name=None):
-        qw = layer.query.weight
-        kw = layer.key.weight
-        vw = layer.value.weight
+        if layer.qkv is not None:
+            projs = [layer.qkv]
+        else:
+            projs = [layer.query, layer.key, layer.value]
 
-        # freeze
-        self.freeze(layer.query)
-        self.freeze(layer.key)
-        self.freeze(layer.value)
+        for proj in projs:
+            # freeze
+            self.freeze(proj)
 
-        # low precision weights
-        if self.wqtype == "adaround":
-            layer.query.wq = weight_quantizer[self.wqtype](nbit=self.wbit, weights=qw, train_flag=True).to(self.device)
-            layer.key.wq = weight_quantizer[self.wqtype](nbit=self.wbit, weights=kw, train_flag=True).to(self.device)
-            layer.value.wq = weight_quantizer[self.wqtype](nbit=self.wbit, weights=vw, train_flag=True).to(self.device)
-        else:
-            layer.query.wq = weight_quantizer[self.wqtype](nbit=self.wbit, train_flag=True).to(self.device)
-            layer.key.wq = weight_quantizer[self.wqtype](nbit=self.wbit, train_flag=True).to(self.device)
-            layer.value.wq = weight_quantizer[self.wqtype](nbit=self.wbit, train_flag=True).to(self.device)
+            # low precision weights
+            if self.wqtype == "adaround":
+                proj.wq = weight_quantizer[self.wqtype](nbit=self.wbit, weights=proj.weight, train_flag=True).to(self.device)
+            else:
+                proj.wq = weight_quantizer[self.wqtype](nbit=self.wbit, train_flag=True).to(self.device)
         
         # tensor quantizer
         xq = input_quantizer[self.xqtype](nbit=self.abit, train_flag=True, unsigned=False).to(self.device)
@@ -535,6 +551,8 @@ class PTQBERT(PTQ):
         elif isinstance(layer, BertSelfOutput):
             qlayer = self.update_output(layer)
 
+        self.compile_quantizers(qlayer)
+
         calib_loss = AverageMeter()
         for idx, batch in enumerate(tqdm(cached_data)):
             # fetch the data